@@ -2,15 +2,14 @@ import asyncio
 
 import coloredlogs
 import logging
+import signal
+import sys
 import threading
 
 from trading import TradingBot
-from messages import TelegramBot
 from analytics import PortfolioAnalytics
 from config import Config
-from dashboard_app import Dashboard
 from exchanges import Exchanges
-from savings_plan_scheduler import SavingsPlanScheduler
 
 """
 
@@ -29,12 +28,23 @@ order_ids_csv = "fundless/data/order_ids.csv"
 order_ids_csv_test = "fundless/data/ids_test.csv"
 
 
+def run_telegram_bot(message_bot):
+    # the event loop is owned by this thread, run_polling only starts the updater and returns
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(message_bot.run_polling())
+    loop.run_forever()
+
+
 if __name__ == "__main__":
     logging_format = "%(asctime)s %(hostname)s %(name)s[%(process)d] %(levelname)s %(message)s"
     coloredlogs.install(level="INFO", fmt=logging_format)
     logger = logging.getLogger()
 
     logger.info("Hi, I will just buy and HODL!")
+    # free-threaded builds (python 3.13t) can run the worker threads in parallel
+    if not getattr(sys, "_is_gil_enabled", lambda: True)():
+        logger.info("Running on a free-threaded python build, the GIL is disabled")
 
     # parse all settings from yaml files
     config = Config.from_yaml_files(config_yaml=config_yaml, secrets_yaml=secrets_yaml)
@@ -57,16 +67,17 @@ if __name__ == "__main__":
     # telegram bot interacting with the user
     if telegram_bot:
         logger.info("Initializing telegram bot...")
+        from messages import TelegramBot
+
         message_bot = TelegramBot(config, trading_bot)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        task = loop.create_task(message_bot.run_polling())
-        threading.Thread(target=loop.run_forever, daemon=True).start()
+        threading.Thread(target=run_telegram_bot, args=(message_bot,), daemon=True).start()
     else:
         message_bot = None
 
     if message_bot is not None:
         logger.info("Initializing savings plan scheduler...")
+        from savings_plan_scheduler import SavingsPlanScheduler
+
         scheduler = SavingsPlanScheduler(config, message_bot)
         savings_plan = threading.Thread(target=scheduler.run, daemon=True)
         savings_plan.start()
@@ -77,13 +88,28 @@ if __name__ == "__main__":
     # dashboard as web application
     if config.dashboard_config.dashboard:
         logger.info("Initializing dashboard...")
+        # dash, flask and gevent are only imported if the dashboard is enabled
+        from dashboard_app import Dashboard
+
         dashboard = Dashboard(config, analytics)
         webapp = threading.Thread(target=dashboard.run_dashboard, daemon=True)
         webapp.start()
     else:
         webapp = None
 
-    if webapp is not None:
-        webapp.join()
-    if savings_plan is not None:
-        savings_plan.join()
+    # keep the process alive while workers are running, until SIGTERM (docker stop) or SIGINT is received
+    shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+    signal.signal(signal.SIGINT, lambda *_: shutdown.set())
+    workers = [worker for worker in (webapp, savings_plan) if worker is not None]
+    while any(worker.is_alive() for worker in workers):
+        # the timeout only serves to notice crashed workers
+        if shutdown.wait(timeout=60):
+            logger.info("Shutting down...")
+            if savings_plan is not None:
+                scheduler.stop()
+                # the scheduler thread is a daemon, it would be killed mid-order when the main thread exits
+                if scheduler.lock.locked():
+                    logger.info("Waiting for the running savings plan execution to finish...")
+                savings_plan.join()
+            break
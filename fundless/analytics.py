@@ -3,15 +3,18 @@ import math
 
 import pandas as pd
 from pathlib import Path
-import pytz
 import requests.exceptions
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pycoingecko import CoinGeckoAPI
 from pydantic import validate_arguments
 from pydantic.types import constr, Optional
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 from typing import Tuple, Union, List
 import numpy as np
-from time import time, sleep
+from time import time
 from redo import retrying
 from threading import Lock
 from datetime import datetime, timedelta
@@ -22,12 +25,13 @@ import ccxt
 
 from config import Config, WeightingEnum, ExchangeEnum
 from utils import print_crypto_amount
-from constants import FIAT_SYMBOLS, COIN_REBRANDING, COIN_SYNONYMS, STABLE_COINS
+from constants import FIAT_SYMBOLS, COIN_REBRANDING, COIN_ALTERNATIVES, STABLE_COINS
 from exchanges import Exchanges
 
 logger = logging.getLogger(__name__)
 
-date_time_regex = "(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})"
+# anchored, ASCII digits only. Passed to constr as str, compiled pydantic builds reject pattern objects
+date_time_regex = r"(?a)^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$"
 
 # TODO: Idea: translate exchange symbol names to coingecko symbol names to have one single source of truth (coingecko)
 # translate coingecko symbols to ccxt/binance symbols
@@ -37,6 +41,35 @@ title_size = 28
 text_size = 20
 min_font_size = 10
 
+# kaleido is not thread-safe, charts are rendered one at a time
+image_render_lock = Lock()
+
+
+def render_png(fig: go.Figure, width: int, height: int) -> bytes:
+    # the chart methods cache the rendered images per chart data
+    with image_render_lock:
+        return pio.to_image(fig, format="png", width=width, height=height)
+
+
+def line_style(n_points: int, as_image: bool) -> Tuple[str, str]:
+    # (line_shape, render_mode) of line charts: splines of long series are expensive to draw in the browser
+    # and add nothing to a static image
+    if as_image:
+        return "linear", "svg"
+    if n_points > 500:
+        return "linear", "webgl"
+    return "spline", "svg"
+
+
+# time ranges of the charts
+chart_ranges = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "6month": timedelta(days=182),
+    "year": timedelta(days=365),
+}
+
 
 class PortfolioAnalytics:
     trades_df: pd.DataFrame
@@ -47,14 +80,27 @@ class PortfolioAnalytics:
     history_df: pd.DataFrame = None
     coingecko: CoinGeckoAPI
     markets: pd.DataFrame  # CoinGecko Market Data
+    markets_by_symbol: dict  # symbol -> {id, name, image, current_price, market_cap}, largest coin for duplicates
+    markets_by_id: dict  # coin id -> {symbol, name, image, current_price, market_cap}
     top_non_stablecoins: pd.DataFrame
     running_updates = False
 
     last_market_update: float = 0  # seconds since epoch
+    market_prices: pd.DataFrame = None  # id and current_price columns of the last market update
+    market_prices_version: int = 0  # increased by update_markets whenever a coin or its price changed
     last_history_update_month: float = 0  # seconds since epoch
     last_history_update_day: float = 0
     history_update_lock = Lock()
     last_trades_update: float = 0
+    trades_file_stat: Tuple[int, int] = None  # (st_mtime_ns, st_size) of trades file when it was last read
+    order_ids_file_stat: Tuple[int, int] = None  # (st_mtime_ns, st_size) of order ids file when it was last read
+    last_balance_update: float = 0
+    max_value_histories = 8  # number of chart ranges (from_timestamp) whose value history is cached
+    # key of the last cumulated_holdings call, its result and the trades it was computed from
+    holdings_cache: Tuple[tuple, Tuple[np.ndarray, np.ndarray, np.ndarray], pd.DataFrame] = None
+    # trades index_df was computed from and its (market_prices_version, index coins, base_cost_row) key
+    index_df_inputs: Tuple[pd.DataFrame, tuple] = None
+    metrics_index_df: pd.DataFrame = None  # index_df the portfolio metrics were computed from
 
     def __init__(
         self,
@@ -68,8 +114,19 @@ class PortfolioAnalytics:
         self.trades_file = Path(trades_file)
         self.order_ids_file = Path(order_ids_file)
         self.coingecko = CoinGeckoAPI()
+        # retry rate limits and server errors within the pooled CoinGecko session (honoring Retry-After),
+        # the last response is still raised as HTTPError when all retries failed
+        retries = Retry(
+            total=5, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False
+        )
+        self.coingecko.session.mount("https://", HTTPAdapter(pool_maxsize=10, max_retries=retries))
         self.exchanges = exchanges
         self.exchange_balance = None
+        self.pending_trades = []  # trades added with flush=False, not yet in a trades DataFrame
+        # from_timestamp -> key of a compute_value_history call, its (value, invested) result and input frames
+        self.value_histories = {}
+        self.charts = {}  # (chart, title, as_image) -> (data the chart was built from, figure or PNG)
+        self.backfilled_coins = set()  # coins whose full price history was fetched after history_df existed
 
         if not self.trades_file.exists():
             self.trades_df = pd.DataFrame(columns=self.trades_cols)
@@ -78,20 +135,27 @@ class PortfolioAnalytics:
         if not self.order_ids_file.exists():
             self.order_ids = pd.DataFrame(columns=["id", "symbol", "date"])
             self.order_ids.to_csv(self.order_ids_file, index=False)
+        self.load_history_file()
         asyncio.run(self.update_data())  # Make sure all data is fetched initially
         self.run_api_updates()
         self.currency_converter = CurrencyConverter()
 
     def run_api_updates(self):
-        def run_updates():
+        async def run_updates():
+            # one long-lived event loop, the update methods throttle their own API calls.
+            # After failed updates (e.g. API rate limits) the polling interval backs off up to 2 minutes
+            interval = 5
             while True:
-                asyncio.run(self.update_data())
-                sleep(5)
+                if await self.update_data():
+                    interval = 5
+                else:
+                    interval = min(interval * 2, 120)
+                await asyncio.sleep(interval)
 
-        updates = Thread(target=run_updates, daemon=True)
+        updates = Thread(target=asyncio.run, args=(run_updates(),), daemon=True)
         updates.start()
 
-    async def update_data(self):
+    async def update_data(self) -> bool:
         try:
             await asyncio.gather(
                 self.update_markets(),
@@ -112,6 +176,9 @@ class PortfolioAnalytics:
         except Exception as e:
             logger.error("Uncaught exception while updating analytics data!")
             logger.error(e)
+        else:
+            return True
+        return False
 
     def init_config_parameters(self):
         self.base_cost_row = f"cost_{self.config.trading_bot_config.base_currency.value.lower()}"
@@ -144,21 +211,50 @@ class PortfolioAnalytics:
             "exchange",
         ]
 
+    @property
+    def history_file(self) -> Path:
+        # prices are denoted in the base currency, so each base currency gets its own file
+        base_currency = self.config.trading_bot_config.base_currency.value.lower()
+        return self.trades_file.with_name(f"{self.trades_file.stem}_prices_{base_currency}.pkl")
+
+    def load_history_file(self):
+        # Start from the price history of the last run instead of pulling the full history from CoinGecko.
+        # The timestamps of the last updates are not restored, so the first update still fetches the last month
+        # and closes the gap since the file was written. After more than a month, the full history is fetched.
+        # Coins that were added to the index or traded since then are backfilled by update_historical_prices
+        history_file = self.history_file
+        if not history_file.exists() or history_file.stat().st_mtime < time() - 60 * 60 * 24 * 30:
+            return
+        try:
+            self.history_df = pd.read_pickle(history_file)
+        except Exception as e:
+            logger.warning(f"Could not read price history file {history_file}, fetching it from the API again")
+            logger.warning(e)
+
     def update_config(self, base_currency_changed: bool = False, index_changed: bool = False):
         self.init_config_parameters()
+        # trades need to be read again to add the cost column of a new base currency
+        self.trades_file_stat = None
+        # the balance is converted to the base currency and fetched from the selected exchange
+        self.last_balance_update = 0
         if base_currency_changed:
             # update all market data again if base currency changed
             self.last_market_update = 0
             self.last_history_update_day = 0
             self.last_history_update_month = 0
+            # prices of the old base currency must not end up in the file of the new one
+            self.history_df = None
+            self.backfilled_coins = set()
+            self.load_history_file()
         if index_changed:
             asyncio.run(self.update_index_df())
 
     def coin_available_on_exchange(self, coin: str):
         if coin.upper() == self.config.trading_bot_config.base_symbol.upper():
             return True
+        # ccxt markets are a dict by symbol, exchange.symbols is a (sorted) list of the same keys
         return (
-            f"{coin.upper()}/{self.config.trading_bot_config.base_symbol.upper()}" in self.exchanges.active.symbols
+            f"{coin.upper()}/{self.config.trading_bot_config.base_symbol.upper()}" in self.exchanges.active.markets
         )
 
     def available_index_coins(self):
@@ -170,13 +266,18 @@ class PortfolioAnalytics:
 
     def available_quote_currency(self, convert_to_accounting_currency=True, force_update=False) -> float:
         if self.exchange_balance is None or force_update:
-            asyncio.run(self.update_exchange_balance())
+            asyncio.run(self.update_exchange_balance(force=True))
         if convert_to_accounting_currency:
             return self.exchange_balance["converted"].get(self.config.trading_bot_config.base_symbol.upper(), 0.0)
         else:
             return self.exchange_balance["amount"].get(self.config.trading_bot_config.base_symbol.upper(), 0.0)
 
-    async def update_exchange_balance(self):
+    async def update_exchange_balance(self, force=False):
+        if not force:
+            # do not update, if last update 30 seconds ago
+            if self.last_balance_update >= time() - 30:
+                return
+
         balance = {
             "amount": {},
             "converted": {},
@@ -184,22 +285,20 @@ class PortfolioAnalytics:
         balances = self.exchanges.active.fetch_total_balance(
             {"limit": 250} if self.config.trading_bot_config.exchange == ExchangeEnum.coinbase else None
         )
-        symbols = np.fromiter([key for key in balances.keys() if balances[key] > 0.0], dtype="U10")
-        amounts = np.fromiter([balances.get(symbol, 0.0) for symbol in symbols], dtype=float)
-        balance["amount"] = {symbol.upper(): amount for symbol, amount in zip(symbols, amounts)}
-        balances["converted"] = {
-            symbol.upper(): self.convert(amount, symbol, self.config.trading_bot_config.base_currency)
-            for symbol, amount in zip(symbols, amounts)
-        }
-        self.exchange_balance = balances
+        # plain dicts, the balance only holds a few coins
+        base_currency = self.config.trading_bot_config.base_currency
+        for symbol, amount in balances.items():
+            if amount > 0.0:
+                balance["amount"][symbol.upper()] = amount
+                balance["converted"][symbol.upper()] = self.convert(amount, symbol, base_currency)
+        self.exchange_balance = balance
+        self.last_balance_update = time()
 
     # for cryptos that might have rebranded and changed their ticker some time
     def get_alternative_crypto_symbols(self, symbol: str) -> [str]:
         symbol = symbol.upper()
-        found = [symbol in synonyms for synonyms in COIN_SYNONYMS]
-        if any(found):
-            found_index = np.where(found)[0]
-            alternatives = [syn for syn in COIN_SYNONYMS[found_index[0]] if syn != symbol]
+        if symbol in COIN_ALTERNATIVES:
+            alternatives = list(COIN_ALTERNATIVES[symbol])
             logger.debug(f"Found alternatives for {symbol}:")
             logger.debug(alternatives)
             return alternatives
@@ -210,19 +309,20 @@ class PortfolioAnalytics:
     def get_coin_id(self, symbol: str):
         symbol = symbol.lower()
         try:
-            coin_id = self.markets.loc[self.markets["symbol"] == symbol, ["id"]].values[0][0]
-        except IndexError as e:
+            coin_id = self.markets_by_symbol[symbol]["id"]
+        except KeyError as e:
             alternatives = self.get_alternative_crypto_symbols(symbol)
             if len(alternatives) > 0:
                 for alt in alternatives:
                     try:
-                        coin_id = self.markets.loc[self.markets["symbol"] == alt.lower(), ["id"]].values[0][0]
-                    except IndexError:
+                        coin_id = self.markets_by_symbol[alt.lower()]["id"]
+                    except KeyError:
                         continue
                     else:
                         return coin_id
             logger.error(f"Could not find market data for {symbol.upper()}")
-            raise e
+            # the telegram balance and index handlers catch KeyError and report its symbol to the user
+            raise KeyError(symbol.upper()) from e
         return coin_id
 
     def get_coin_name(self, symbol: str, abbr=False):
@@ -230,15 +330,15 @@ class PortfolioAnalytics:
             return symbol
         symbol = symbol.lower()
         try:
-            coin_name = self.markets.loc[self.markets["symbol"] == symbol, ["name"]].values[0][0]
-        except IndexError as e:
+            coin_name = self.markets_by_symbol[symbol]["name"]
+        except KeyError:
             logger.warning(f"No coin name found in Coingecko market data for {symbol.upper()}!")
             alternatives = self.get_alternative_crypto_symbols(symbol)
             if len(alternatives) > 0:
                 for alt in alternatives:
                     try:
-                        coin_name = self.markets.loc[self.markets["symbol"] == alt.lower(), ["name"]].values[0][0]
-                    except IndexError:
+                        coin_name = self.markets_by_symbol[alt.lower()]["name"]
+                    except KeyError:
                         continue
                     else:
                         if abbr:
@@ -255,8 +355,8 @@ class PortfolioAnalytics:
     def get_coin_image(self, symbol: str):
         symbol = symbol.lower()
         try:
-            image = self.markets.loc[self.markets["symbol"] == symbol, ["image"]].values[0][0]
-        except IndexError:
+            image = self.markets_by_symbol[symbol]["image"]
+        except KeyError:
             logger.warning(f"No image found for coin {symbol.upper()}!")
             return "assets/coins-solid.png"
         return image
@@ -284,16 +384,11 @@ class PortfolioAnalytics:
     def get_crypto_price(self, crypto: str, vs_currency: str):
         crypto_id = self.get_coin_id(crypto)
         if vs_currency.lower() == self.config.trading_bot_config.base_currency.lower():
-            price = self.markets.loc[self.markets["id"] == crypto_id, ["current_price"]].values[0][0]
+            price = self.markets_by_id[crypto_id]["current_price"]
         else:
-            with retrying(
-                self.coingecko.get_price,
-                sleeptime=1,
-                sleepscale=2,
-                jitter=0,
-                retry_exceptions=(requests.exceptions.HTTPError,),
-            ) as get_price:
-                price = get_price(crypto_id, vs_currencies=vs_currency.lower())[crypto_id][vs_currency.lower()]
+            price = self.coingecko.get_price(crypto_id, vs_currencies=vs_currency.lower())[crypto_id][
+                vs_currency.lower()
+            ]
         return price
 
     def base_symbol_to_base_currency(self, base_symbol_amount: float):
@@ -308,12 +403,19 @@ class PortfolioAnalytics:
 
     async def update_trades_df(self):
         if self.last_trades_update < time() - 60:
-            trades_df = pd.read_csv(self.trades_file, dtype=self.csv_dtypes, parse_dates=["date"])
-            trades_df.date = pd.to_datetime(trades_df.date, utc=True)
+            stat = self.trades_file.stat()
+            trades_file_stat = (stat.st_mtime_ns, stat.st_size)
+            if (
+                trades_file_stat == self.trades_file_stat
+                and self.order_ids["id"].isin(self.trades_df["id"]).all()
+            ):
+                # file did not change since last read and there are no missing orders to add
+                self.last_trades_update = time()
+                return
 
-            if len(trades_df) > 0:
-                if trades_df["date"].iloc[0].tzinfo is None:
-                    trades_df["date"] = trades_df["date"].dt.tz_localize("UTC", ambiguous="infer")
+            # parse dates in a single pass, naive dates are interpreted as UTC
+            trades_df = pd.read_csv(self.trades_file, dtype=self.csv_dtypes)
+            trades_df["date"] = pd.to_datetime(trades_df["date"], utc=True)
 
             update_file = False
 
@@ -328,6 +430,7 @@ class PortfolioAnalytics:
             if len(missing_ids) > 0:
                 logger.warning("Found orders in orders.csv that are not in trades.csv!")
                 logger.warning("Adding them to trades.csv")
+                self.pending_trades = []
                 for id, symbol, date in zip(
                     missing_ids["id"].values,
                     missing_ids["symbol"].values,
@@ -354,8 +457,8 @@ class PortfolioAnalytics:
                             continue
                         else:
                             logger.info(f"Order {id} closed, adding to trades.csv")
-                            trades_df = self.add_trade(
-                                trades_df=trades_df,
+                            self.add_trade(
+                                flush=False,
                                 date=datetime.fromtimestamp(order["timestamp"] / 1000.0).strftime(
                                     "%Y-%m-%d %H:%M:%S"
                                 ),
@@ -370,57 +473,56 @@ class PortfolioAnalytics:
                                 exchange=self.config.trading_bot_config.exchange,
                             )
                             update_file = True
+                if len(self.pending_trades) > 0:
+                    trades_df = pd.concat([trades_df, pd.DataFrame(self.pending_trades)], ignore_index=True)
+                    self.pending_trades = []
+                    # added trades are denoted in local time
+                    trades_df["date"] = pd.to_datetime(trades_df["date"], utc=True)
 
             # compute total cost if missing
             trades_df["fee"].fillna(0.0, inplace=True)
             if any(trades_df["cost_total"].isna()):
                 trades_df["cost_total"] = trades_df["cost"] + trades_df["fee"]
 
-            # base_cost_row has the cost denoted in base_currency rather than buy_symbol
-            def compute_base_cost(row):
+            # historic prices in accounting currency by (coin_id, date), every coin and day is only fetched once
+            historic_prices = {}
+
+            # price of a trade's sell_symbol in accounting currency on the day of the trade
+            def historic_price(trade) -> float:
                 accounting_currency = self.config.trading_bot_config.base_currency.value.lower()
-                date = row.date.strftime("%d-%m-%Y")
-                if row.sell_symbol not in FIAT_SYMBOLS:
-                    coin_id = self.get_coin_id(row.sell_symbol)  # TODO support for fiat as sell_symbol
+                if trade.sell_symbol.lower() == accounting_currency:
+                    return 1.0
+                date = trade.date.strftime("%d-%m-%Y")
+                if trade.sell_symbol not in FIAT_SYMBOLS:
+                    coin_id = self.get_coin_id(trade.sell_symbol)  # TODO support for fiat as sell_symbol
                 else:
-                    coin_id = row.sell_symbol
-
-                def convert_cost():
-                    if row.sell_symbol.lower() != accounting_currency:
-                        # TODO use convert method (implement historic prices in convert method)
-                        return (
-                            self.coingecko.get_coin_history_by_id(coin_id, date=date, localization=False)[
-                                "market_data"
-                            ]["current_price"][accounting_currency]
-                            * row.cost_total
-                        )
-                    else:
-                        return row.cost_total
+                    coin_id = trade.sell_symbol
 
-                with retrying(
-                    convert_cost,
-                    sleeptime=20,
-                    sleepscale=1,
-                    jitter=0,
-                    retry_exceptions=(requests.exceptions.HTTPError,),
-                ) as get_base_cost:
-                    base_cost = get_base_cost()
+                if (coin_id, date) not in historic_prices:
+                    # TODO use convert method (implement historic prices in convert method)
+                    history = self.coingecko.get_coin_history_by_id(coin_id, date=date, localization=False)
+                    historic_prices[(coin_id, date)] = history["market_data"]["current_price"][accounting_currency]
+                return historic_prices[(coin_id, date)]
 
-                return base_cost
+            # base_cost_row has the cost denoted in base_currency rather than buy_symbol
+            def compute_base_cost(trades: pd.DataFrame) -> np.ndarray:
+                prices = np.array([historic_price(trade) for trade in trades.itertuples()], dtype=float)
+                return prices * trades["cost_total"].to_numpy(dtype=float)
 
             # add cost of trades in currently selected currency, it it's not there yet
             if self.base_cost_row in trades_df.columns:
-                if trades_df[self.base_cost_row].isnull().values.any():
-                    trades_df.loc[trades_df[self.base_cost_row].isnull(), self.base_cost_row] = trades_df.loc[
-                        trades_df[self.base_cost_row].isnull()
-                    ].apply(lambda row: compute_base_cost(row), axis=1)
+                missing_base_cost = trades_df[self.base_cost_row].isnull()
+                if missing_base_cost.values.any():
+                    trades_df.loc[missing_base_cost, self.base_cost_row] = compute_base_cost(
+                        trades_df.loc[missing_base_cost]
+                    )
                     update_file = True
             else:
                 logger.info(
                     "Updating your trades file with historic cost in base currency, this will take a while "
                     "but is only performed once!"
                 )
-                trades_df[self.base_cost_row] = trades_df.apply(lambda row: compute_base_cost(row), axis=1)
+                trades_df[self.base_cost_row] = compute_base_cost(trades_df)
                 update_file = True
 
             # add column for used exchange, if it's not there yet
@@ -435,42 +537,70 @@ class PortfolioAnalytics:
                 update_file = True
 
             # check if a coin has been rebranded and the old name is still used in the file
-            if trades_df["buy_symbol"].isin(pd.Series(COIN_REBRANDING.keys())).any():
-                trades_df["buy_symbol"].replace(COIN_REBRANDING, inplace=True)
-                trades_df["sell_symbol"].replace(COIN_REBRANDING, inplace=True)
-                update_file = True
+            for col in ["buy_symbol", "sell_symbol"]:
+                rebranded = trades_df[col].isin(list(COIN_REBRANDING))
+                if rebranded.values.any():
+                    # only the rows with an old name are rewritten
+                    trades_df.loc[rebranded, col] = trades_df.loc[rebranded, col].map(COIN_REBRANDING)
+                    update_file = True
 
-            trades_df.date = pd.to_datetime(trades_df.date, utc=True)
             self.trades_df = trades_df
+            self.trades_file_stat = trades_file_stat
             self.last_trades_update = time()
             if update_file:
                 self.update_trades_file()
 
-    def update_trades_file(self):
-        self.trades_df.sort_values("date", inplace=True)
-        self.trades_df.to_csv(self.trades_file, index=False)
+    def update_trades_file(self, new_trades: pd.DataFrame = None):
+        stat = self.trades_file.stat()
+        file_unchanged = (stat.st_mtime_ns, stat.st_size) == self.trades_file_stat
+        if new_trades is not None:
+            # trades stay sorted by date, only the new rows need to be written
+            new_trades.to_csv(self.trades_file, mode="a", header=False, index=False)
+        else:
+            self.trades_df.sort_values("date", inplace=True)
+            self.trades_df.to_csv(self.trades_file, index=False)
+        if file_unchanged:
+            # the file now matches trades_df, it does not need to be read again
+            stat = self.trades_file.stat()
+            self.trades_file_stat = (stat.st_mtime_ns, stat.st_size)
+        else:
+            # the file was changed by someone else or has to be read again (e.g. for a new base currency),
+            # keep it marked for the next update
+            self.trades_file_stat = None
 
     def add_order_id(self, id: str, symbol: str, date: Union[str, datetime]):
-        date = pd.to_datetime(date, infer_datetime_format=True)
+        date = pd.Timestamp(date)
         if date.tzinfo is None:
             date = date.tz_localize("Europe/Berlin")
         else:
             date = date.tz_convert("Europe/Berlin")
-        id_dict = {"id": [id], "symbol": [symbol], "date": [date]}
-        id_df = pd.DataFrame.from_dict(id_dict)
-        self.order_ids = pd.concat([self.order_ids, id_df], ignore_index=True)
-        self.update_order_ids_file()
+        order_id = pd.DataFrame({"id": [id], "symbol": [symbol], "date": [date.tz_convert("UTC")]})
+        # The order ids file is the record to recover the trades of placed orders, so every id is written
+        # right away. Only the new row is appended, orders are placed now, so the file stays sorted by date
+        stat = self.order_ids_file.stat()
+        file_unchanged = (stat.st_mtime_ns, stat.st_size) == self.order_ids_file_stat
+        order_id.reindex(columns=self.order_ids.columns).to_csv(
+            self.order_ids_file, mode="a", header=False, index=False
+        )
+        self.order_ids = pd.concat([self.order_ids, order_id], ignore_index=True)
+        if file_unchanged:
+            # the file matches order_ids, it does not need to be read again
+            stat = self.order_ids_file.stat()
+            self.order_ids_file_stat = (stat.st_mtime_ns, stat.st_size)
+        else:
+            # the file was changed by someone else, read it again with the next update
+            self.order_ids_file_stat = None
 
     async def update_order_ids(self):
-        self.order_ids = pd.read_csv(self.order_ids_file, index_col=False, parse_dates=["date"])
-        self.order_ids.date = pd.to_datetime(self.order_ids.date, utc=True)
-        if len(self.order_ids) > 0:
-            if self.order_ids["date"].iloc[0].tzinfo is None:
-                self.order_ids["date"] = self.order_ids["date"].dt.tz_localize("UTC", ambiguous="infer")
-
-    def update_order_ids_file(self):
-        self.order_ids.sort_values("date", inplace=True)
-        self.order_ids.to_csv(self.order_ids_file, index=False)
+        stat = self.order_ids_file.stat()
+        order_ids_file_stat = (stat.st_mtime_ns, stat.st_size)
+        if order_ids_file_stat == self.order_ids_file_stat:
+            # file did not change since last read
+            return
+        order_ids = pd.read_csv(self.order_ids_file, index_col=False)
+        order_ids["date"] = pd.to_datetime(order_ids["date"], utc=True)
+        self.order_ids = order_ids
+        self.order_ids_file_stat = order_ids_file_stat
 
     async def update_markets(self, force=False):
         if not force:
@@ -480,53 +610,87 @@ class PortfolioAnalytics:
 
         # update market data from coingecko
         try:
-            with retrying(
-                self.coingecko.get_coins_markets,
-                sleeptime=20,
-                sleepscale=1,
-                jitter=0,
-                retry_exceptions=(requests.exceptions.HTTPError,),
-            ) as get_markets:
-                markets = pd.DataFrame.from_records(
-                    get_markets(
-                        vs_currency=self.config.trading_bot_config.base_currency.value,
-                        per_page=250,
-                    )
+            markets = pd.DataFrame.from_records(
+                self.coingecko.get_coins_markets(
+                    vs_currency=self.config.trading_bot_config.base_currency.value,
+                    per_page=250,
                 )
-                more_markets = pd.DataFrame.from_records(
-                    get_markets(
-                        vs_currency=self.config.trading_bot_config.base_currency.value, per_page=250, page=2
-                    )
+            )
+            more_markets = pd.DataFrame.from_records(
+                self.coingecko.get_coins_markets(
+                    vs_currency=self.config.trading_bot_config.base_currency.value, per_page=250, page=2
                 )
-                markets = pd.concat([markets, more_markets], ignore_index=True)
-                markets["symbol"] = markets["symbol"].str.lower()
+            )
+            markets = pd.concat([markets, more_markets], ignore_index=True)
+            markets["symbol"] = markets["symbol"].str.lower()
         except requests.exceptions.HTTPError as e:
             logger.error("Network error while updating market data from CoinGecko:")
             logger.error(e)
             return
         markets.replace(coingecko_symbol_dict, inplace=True)
         self.markets = markets
+        # lookup tables for single coins, markets are sorted by market cap so the first duplicate symbol is kept
+        market_cols = ["id", "symbol", "name", "image", "current_price", "market_cap"]
+        self.markets_by_symbol = (
+            markets[market_cols].drop_duplicates("symbol").set_index("symbol").to_dict(orient="index")
+        )
+        self.markets_by_id = markets[market_cols].drop_duplicates("id").set_index("id").to_dict(orient="index")
         self.top_non_stablecoins = markets.loc[~markets.symbol.str.upper().isin(STABLE_COINS)]
+        # CoinGecko updates its prices less often than they are polled, only count real changes
+        market_prices = markets[["id", "current_price"]]
+        if self.market_prices is None or not market_prices.equals(self.market_prices):
+            self.market_prices = market_prices
+            self.market_prices_version += 1
         self.last_market_update = time()
 
     async def update_index_df(self):
+        # only recompute, if prices, trades or the index coins changed since the last update.
+        # New trades replace trades_df, the frame is held with the key, so its identity can not be reused
+        trades_df = self.trades_df
+        index_df_key = (
+            self.market_prices_version,
+            tuple(self.config.trading_bot_config.cherry_pick_symbols or []),
+            self.base_cost_row,
+        )
+        if self.index_df is not None and self.index_df_inputs is not None:
+            last_trades_df, last_key = self.index_df_inputs
+            if last_trades_df is trades_df and last_key == index_df_key:
+                return
         # update index portfolio value
-        other = pd.DataFrame(index=self.config.trading_bot_config.cherry_pick_symbols)
-        index_df = (
-            self.trades_df[["buy_symbol", "amount", self.base_cost_row]]
-            .copy()
-            .groupby("buy_symbol")
-            .sum(numeric_only=True)
+        # sum up amount and cost of all trades per coin
+        buy_symbols = trades_df["buy_symbol"].fillna("").str.lower().to_numpy(dtype=str)
+        traded_symbols, trade_coin = np.unique(buy_symbols, return_inverse=True)
+        traded_amounts = np.bincount(trade_coin, weights=trades_df["amount"].fillna(0).to_numpy(dtype=float))
+        traded_costs = np.bincount(
+            trade_coin, weights=trades_df[self.base_cost_row].fillna(0).to_numpy(dtype=float)
+        )
+        traded = {symbol: k for k, symbol in enumerate(traded_symbols)}
+
+        # all traded and cherry picked coins with market data, ordered by market cap
+        index_symbols = set(traded) | set(self.config.trading_bot_config.cherry_pick_symbols or [])
+        symbols = [symbol for symbol in self.markets_by_symbol if symbol in index_symbols]
+        amount = np.array([traded_amounts[traded[symbol]] if symbol in traded else 0.0 for symbol in symbols])
+        cost = np.array([traded_costs[traded[symbol]] if symbol in traded else 0.0 for symbol in symbols])
+        current_price = np.array(
+            [self.markets_by_symbol[symbol]["current_price"] for symbol in symbols], dtype=float
+        )
+
+        value = current_price * amount
+        with np.errstate(divide="ignore", invalid="ignore"):
+            allocation = value / value.sum()
+            performance = value / cost - 1
+        self.index_df_inputs = (trades_df, index_df_key)
+        self.index_df = pd.DataFrame(
+            {
+                "symbol": [symbol.upper() for symbol in symbols],
+                "current_price": current_price,
+                "amount": amount,
+                self.base_cost_row: cost,
+                "value": value,
+                "allocation": allocation,
+                "performance": performance,
+            }
         )
-        index_df.index = index_df.index.str.lower()
-        index_df = pd.merge(index_df, other, how="outer", left_index=True, right_index=True)
-        index_df.fillna(value=0, inplace=True, axis="columns")
-        index_df = self.markets[["symbol", "current_price"]].join(index_df, on="symbol", how="inner")
-        index_df["value"] = index_df["current_price"] * index_df["amount"]
-        index_df["allocation"] = index_df["value"] / index_df["value"].sum()
-        index_df["symbol"] = index_df["symbol"].str.upper()
-        index_df["performance"] = index_df["value"] / index_df[self.base_cost_row] - 1
-        self.index_df = index_df
 
     @validate_arguments
     def add_trade(
@@ -542,7 +706,7 @@ class PortfolioAnalytics:
         fee_symbol: Optional[str],
         base_cost: Optional[float] = None,
         exchange: Optional[ExchangeEnum] = None,
-        trades_df=None,
+        flush: bool = True,
     ):
         if base_cost is None:
             base_cost = self.base_symbol_to_base_currency(cost)
@@ -552,38 +716,51 @@ class PortfolioAnalytics:
             fee_symbol = ""
         if exchange is None:
             exchange = self.config.trading_bot_config.exchange
-        date = pd.to_datetime(date, infer_datetime_format=True)
+        date = pd.Timestamp(date)
         if date.tzinfo is None:
             date = date.tz_localize("Europe/Berlin")
         else:
             date = date.tz_convert("Europe/Berlin")
 
-        trade_dict = {
-            "date": [date],
-            "id": [id],
-            "buy_symbol": [buy_symbol.upper()],
-            "sell_symbol": [sell_symbol.upper()],
-            "price": [price],
-            "amount": [amount],
-            "cost": [cost],
-            "fee": [fee],
-            "fee_symbol": [fee_symbol.upper()],
-            self.base_cost_row: [base_cost],
+        trade = {
+            "date": date,
+            "id": id,
+            "buy_symbol": buy_symbol.upper(),
+            "sell_symbol": sell_symbol.upper(),
+            "price": price,
+            "amount": amount,
+            "cost": cost,
+            "fee": fee,
+            "fee_symbol": fee_symbol.upper(),
+            self.base_cost_row: base_cost,
             "exchange": exchange.value,
         }
-        trade_dict_df = pd.DataFrame.from_dict(trade_dict)
-        if trades_df is not None:
-            trades_df = pd.concat([trades_df, trade_dict_df], ignore_index=True)
-            return trades_df
+        if not flush:
+            # collect trades and concat them at once, instead of copying the whole trades_df per trade
+            self.pending_trades.append(trade)
         else:
-            self.trades_df = pd.concat([self.trades_df, trade_dict_df], ignore_index=True)
-            self.update_trades_file()
+            trades_df = self.trades_df
+            # same columns and UTC dates as trades read from the file, so trades_df does not need to be reloaded
+            trade["cost_total"] = cost + fee
+            trade_df = pd.DataFrame([trade])
+            # keep the values of columns trades_df does not have yet, e.g. the cost in a new base currency
+            new_columns = trade_df.columns.difference(trades_df.columns)
+            trade_df = trade_df.reindex(columns=trades_df.columns.append(new_columns))
+            trade_df["date"] = trade_df["date"].dt.tz_convert("UTC")
+            newest = len(trades_df) == 0 or not date < trades_df["date"].max()
+            self.trades_df = pd.concat([trades_df, trade_df], ignore_index=True)
+            # appending is only possible with the same columns as in the file header
+            if newest and len(new_columns) == 0:
+                self.update_trades_file(new_trades=trade_df)
+            else:
+                self.update_trades_file()
 
     async def index_balance(self) -> Tuple:
-        await self.update_markets()
-        if self.index_df is None:
+        # index_df is kept up to date by the update thread, refreshing the markets here would not change it
+        index_df = self.index_df
+        if index_df is None:
             return None, None, None, None
-        index = self.index_df.sort_values(by="allocation", ascending=False)
+        index = index_df.sort_values(by="allocation", ascending=False)
         allocations = index["allocation"].values * 100
         symbols = index["symbol"].values
         values = index["value"].values
@@ -594,7 +771,7 @@ class PortfolioAnalytics:
     def performance(self) -> float:
         if self.trades_df is None or self.index_df is None:
             return 0
-        amount_invested = self.trades_df[self.base_cost_row].sum()
+        amount_invested = self.invested
         portfolio_value = self.index_df.value.sum()
         return portfolio_value / amount_invested - 1
 
@@ -602,7 +779,9 @@ class PortfolioAnalytics:
     def invested(self) -> float:
         if self.trades_df is None:
             return 0
-        return self.trades_df[self.base_cost_row].sum()
+        # total cost of all coins after the last trade, from the cached arrays of the value history
+        _, coins, holdings = self.cumulated_holdings(self.trades_df)
+        return holdings[-1, len(coins) :].sum()
 
     @property
     def net_worth(self) -> float:
@@ -615,38 +794,54 @@ class PortfolioAnalytics:
         df = pd.DataFrame()
         if self.index_df is None:
             return df
-        self.index_df.sort_values(by="allocation", ascending=False, inplace=True)
+        # sorted copy for display, self.index_df is shared with the update thread and is not modified here
+        index_df = self.index_df.sort_values(by="allocation", ascending=False)
         value_format = f"{self.config.trading_bot_config.base_currency.values[1]} {{:,.2f}}"
-        df["Coin"] = self.index_df["symbol"]
-        df["Currently in Index"] = self.index_df["symbol"].map(
-            lambda sym: "yes" if sym.lower() in self.config.trading_bot_config.cherry_pick_symbols else "no"
-        )
-        df[f"Available"] = self.index_df["symbol"].map(
+        df["Coin"] = index_df["symbol"]
+        in_index = index_df["symbol"].str.lower().isin(self.config.trading_bot_config.cherry_pick_symbols)
+        df["Currently in Index"] = np.where(in_index, "yes", "no")
+        df[f"Available"] = index_df["symbol"].map(
             lambda sym: "yes" if self.coin_available_on_exchange(sym) else "no"
         )
-        df["Amount"] = self.index_df["amount"].map(print_crypto_amount)
-        df["Allocation"] = self.index_df["allocation"].map("{:.2%}".format)
+        df["Amount"] = index_df["amount"].map(print_crypto_amount)
+        df["Allocation"] = index_df["allocation"].map("{:.2%}".format)
         _, target_allocation = self.fetch_index_weights(symbols=df["Coin"])
         df["Target Allocation"] = target_allocation
         df["Target Allocation"] = df["Target Allocation"].map(lambda row: f"{row:.2%}" if row != 0 else "-")
-        df["Value"] = self.index_df["value"].map(value_format.format)
-        df["Performance"] = self.index_df["performance"].fillna(0).map("{:.2%}".format)
+        df["Value"] = index_df["value"].map(value_format.format)
+        df["Performance"] = index_df["performance"].fillna(0).map("{:.2%}".format)
         return df
 
+    def cached_chart(self, key: tuple, data):
+        # The chart data is replaced rather than mutated on updates, so the same object means the same chart.
+        # The cache holds a reference to the data, its id can not be reused by new data while cached.
+        # Figures are shared between callers, they are only serialized and never modified
+        cached = self.charts.get(key)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        return None
+
     def allocation_pie(self, as_image=False, title=True):
-        if self.index_df is None:
+        allocation_df = self.index_df  # only read by plotly, update_index_df replaces rather than mutates it
+        if allocation_df is None:
             return {}
-        allocation_df = self.index_df.copy()
-
-        fig = px.pie(
-            allocation_df,
-            values="allocation",
-            names="symbol",
-            color_discrete_sequence=px.colors.sequential.Viridis,
-            hole=0.6,
+        chart = self.cached_chart(("allocation", title, as_image), allocation_df)
+        if chart is not None:
+            return chart
+
+        # the frame is already in shape, graph objects skip the data frame handling of plotly express
+        fig = go.Figure(
+            go.Pie(
+                values=allocation_df["allocation"].to_numpy(),
+                labels=allocation_df["symbol"].to_numpy(),
+                hole=0.6,
+                textposition="inside",
+                textinfo="label",
+                hoverinfo="label+percent",
+            )
         )
-        fig.update_traces(textposition="inside", textinfo="label", hoverinfo="label+percent")
         fig.update_layout(
+            piecolorway=px.colors.sequential.Viridis,
             showlegend=False,
             title={"xanchor": "center", "x": 0.5},
             uniformtext_minsize=min_font_size,
@@ -666,13 +861,17 @@ class PortfolioAnalytics:
         if title:
             fig.update_layout(title="Coin Allocation")
         if as_image:
-            return fig.to_image(format="png", width=600, height=600)
+            chart = render_png(fig, width=600, height=600)
         else:
-            return fig
+            chart = fig
+        self.charts[("allocation", title, as_image)] = (allocation_df, chart)
+        return chart
 
     async def update_historical_prices(self):
         if self.last_market_update == 0:
             return
+        if self.history_df is not None:
+            await self.backfill_historical_prices()
         to_timestamp = time()
         freq = None
         month = 60 * 60 * 24 * 30
@@ -696,78 +895,132 @@ class PortfolioAnalytics:
 
         with self.history_update_lock:
             # pull historic market data for all coins (pretty heavy on API requests)
-            for coin in self.index_df["symbol"].str.lower():
-                id = self.markets.loc[self.markets["symbol"] == coin, ["id"]].values[0][0]
-                try:
-                    with retrying(
-                        self.coingecko.get_coin_market_chart_range_by_id,
-                        sleeptime=30,
-                        sleepscale=1,
-                        jitter=0,
-                        retry_exceptions=(requests.exceptions.HTTPError,),
-                    ) as get_history:
-                        data = get_history(
-                            id=id,
-                            vs_currency=self.config.trading_bot_config.base_currency.value,
-                            from_timestamp=from_timestamp,
-                            to_timestamp=to_timestamp,
-                        )
-                except requests.exceptions.HTTPError as e:
-                    logger.error("Error while updating historic prices from API")
-                    logger.error(e)
-                    return
-                data_df = pd.DataFrame.from_records(data["prices"], columns=["timestamp", f"{coin}"])
-                data_df["timestamp"] = pd.to_datetime(data_df["timestamp"], unit="ms", utc=True)
-                data_df.set_index("timestamp", inplace=True)
-                if "history_df" not in locals():
-                    history_df = data_df
-                else:
-                    history_df = history_df.join(data_df, how="outer")
+            coins = list(self.index_df["symbol"].str.lower())
+            try:
+                frames = await self.fetch_price_histories(coins, from_timestamp, to_timestamp)
+            except requests.exceptions.HTTPError as e:
+                logger.error("Error while updating historic prices from API")
+                logger.error(e)
+                return
+            # align all coins in one go instead of joining them one by one
+            history_df = pd.concat(frames, axis=1, join="outer", copy=False).sort_index()
 
             if freq is not None:
-                # round datetime index to given frequency,
-                # otherwise all coins have price data at slightly different times
-                history_df = (
-                    history_df.fillna(method="ffill")
-                    .fillna(method="bfill")
-                    .reindex(history_df.index.round(freq).drop_duplicates(), method="nearest")
-                )
+                # bin prices to given frequency, otherwise all coins have price data at slightly different times.
+                # The last price of each coin within a bin is used, bins without any price are filled
+                history_df = history_df.resample(freq).last().fillna(method="ffill").fillna(method="bfill")
                 if freq == "H":
-                    truncate_from = pd.to_datetime(from_timestamp, unit="s", utc=True)
-                    truncate_to = pd.to_datetime(to_timestamp - day, unit="s", utc=True)
+                    truncate_from = pd.Timestamp(from_timestamp, unit="s", tz="UTC")
+                    truncate_to = pd.Timestamp(to_timestamp - day, unit="s", tz="UTC")
                 elif freq == "5T":
-                    truncate_from = pd.to_datetime(to_timestamp - day, unit="s", utc=True)
-                    truncate_to = pd.to_datetime(time(), unit="s", utc=True)
+                    truncate_from = pd.Timestamp(to_timestamp - day, unit="s", tz="UTC")
+                    truncate_to = pd.Timestamp(time(), unit="s", tz="UTC")
             else:
-                truncate_from = pd.to_datetime(time(), unit="s", utc=True)
+                truncate_from = pd.Timestamp(time(), unit="s", tz="UTC")
                 truncate_to = truncate_from
 
             # add most recent prices for data consistency
-            current_prices = [
-                self.markets.loc[self.markets["symbol"] == symbol, ["current_price"]].values[0][0]
-                for symbol in list(history_df.columns)
-            ]
+            current_prices = [self.markets_by_symbol[symbol]["current_price"] for symbol in history_df.columns]
             now_row = pd.DataFrame(
                 [current_prices],
                 columns=history_df.columns,
                 index=[pd.Timestamp.now(tz="utc")],
             )
-            history_df = pd.concat([history_df, now_row]).sort_index()
+            # the most recent prices are normally appended at the end, sort only if the clock says otherwise
+            history_df = pd.concat([history_df, now_row])
+            if not history_df.index.is_monotonic_increasing:
+                history_df = history_df.sort_index()
 
             if self.history_df is not None:
-                mask = (self.history_df.index < truncate_from) | (self.history_df.index > truncate_to)
-                history_df = pd.concat([history_df, self.history_df.loc[mask]])
-                history_df = history_df[~history_df.index.duplicated(keep="first")].sort_index()
-            self.history_df = history_df
+                # keep old prices outside of [truncate_from, truncate_to], new prices take precedence.
+                # Both indices are sorted: the old head ends before the new data and can simply be prepended,
+                # only the (short) old tail interleaves with the new data
+                old_index = self.history_df.index
+                head_end = min(old_index.searchsorted(truncate_from), old_index.searchsorted(history_df.index[0]))
+                tail_start = old_index.searchsorted(truncate_to, side="right")
+                history_df = pd.concat(
+                    [self.history_df.iloc[:head_end], history_df.combine_first(self.history_df.iloc[tail_start:])]
+                )
+            # prices are only charted, single precision halves the memory of the long-lived price matrix
+            history_df = history_df.astype(np.float32, copy=False)
+            if self.history_df is None or not history_df.equals(self.history_df):
+                self.history_df = history_df
+                history_df.to_pickle(self.history_file)
+
+    async def backfill_historical_prices(self):
+        # The regular updates only fetch the last month or day. Coins added to the index or traded after the
+        # full history was fetched (e.g. when history_df was loaded from the file of an earlier run) would have
+        # no prices for their older trades, so their full history is fetched once
+        trades_df = self.trades_df
+        first_trades = trades_df.groupby(trades_df["buy_symbol"].str.lower())["date"].min()
+        history_df = self.history_df
+        coins = []
+        for coin in self.index_df["symbol"].str.lower():
+            if coin not in first_trades.index or coin in self.backfilled_coins:
+                continue
+            first_price = history_df[coin].first_valid_index() if coin in history_df.columns else None
+            if first_price is None or first_price > first_trades[coin]:
+                coins.append(coin)
+        if len(coins) == 0:
+            return
+
+        with self.history_update_lock:
+            from_timestamp = (first_trades[coins].min() - pd.DateOffset(2)).timestamp()
+            try:
+                frames = await self.fetch_price_histories(coins, from_timestamp, time())
+            except requests.exceptions.HTTPError as e:
+                logger.error("Error while fetching the price history of newly added coins from API")
+                logger.error(e)
+                return
+            # coins CoinGecko has no older prices for are not fetched again with every update
+            self.backfilled_coins.update(coins)
+            # stored prices take precedence, the backfill only adds the missing older prices
+            backfill = pd.concat(frames, axis=1, join="outer", copy=False)
+            self.history_df = self.history_df.combine_first(backfill).astype(np.float32, copy=False)
+            self.history_df.to_pickle(self.history_file)
+
+    async def fetch_price_histories(self, coins: List[str], from_timestamp: float, to_timestamp: float):
+        # a few requests run concurrently to stay within the CoinGecko rate limit
+        api_slots = asyncio.Semaphore(5)
+
+        async def get_history(coin: str) -> pd.DataFrame:
+            async with api_slots:
+                return await asyncio.to_thread(self.fetch_price_history, coin, from_timestamp, to_timestamp)
+
+        return await asyncio.gather(*[get_history(coin) for coin in coins])
+
+    def fetch_price_history(self, coin: str, from_timestamp: float, to_timestamp: float) -> pd.DataFrame:
+        # runs in a worker thread, so the response is also parsed concurrently with the other coins
+        data = self.coingecko.get_coin_market_chart_range_by_id(
+            id=self.markets_by_symbol[coin]["id"],
+            vs_currency=self.config.trading_bot_config.base_currency.value,
+            from_timestamp=from_timestamp,
+            to_timestamp=to_timestamp,
+        )
+        data_df = pd.DataFrame.from_records(data["prices"], columns=["timestamp", f"{coin}"])
+        data_df["timestamp"] = pd.to_datetime(data_df["timestamp"], unit="ms", utc=True)
+        data_df.set_index("timestamp", inplace=True)
+        # concat aligns on unique indices only
+        return data_df[~data_df.index.duplicated(keep="last")]
 
     def compute_value_history(self, from_timestamp=None):
-        if self.history_df is None:
+        trades_df = self.trades_df
+        history_df = self.history_df
+        if history_df is None:
             raise ValueError
+        # charts of the same range are usually rendered together, reuse the result while no input data changed.
+        # trades_df and history_df are replaced rather than modified by the updates, so their ids identify them.
+        # Only the current prices are taken from the markets, a market poll without price changes keeps the result
+        cache_key = (id(trades_df), id(history_df), self.market_prices_version, self.base_cost_row)
+        cached = self.value_histories.get(from_timestamp)
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
         if from_timestamp is not None:
-            start_time = pd.to_datetime(from_timestamp, unit="s", utc=True)
-            price_history = self.history_df.copy().truncate(before=start_time)
+            start_time = pd.Timestamp(from_timestamp, unit="s", tz="UTC")
+            # no copies, price_history is only read until resample creates a new frame
+            price_history = history_df.truncate(before=start_time, copy=False)
         else:
-            price_history = self.history_df.copy()
+            price_history = history_df
             start_time = price_history.index.min()
         if start_time < (pd.Timestamp.now(tz="utc") - pd.DateOffset(days=31)):
             freq = "D"
@@ -780,70 +1033,105 @@ class PortfolioAnalytics:
 
         price_history = price_history.resample(freq, origin="end").ffill()
         # add most recent prices for data consistency
-        current_prices = [
-            self.markets.loc[self.markets["symbol"] == symbol, ["current_price"]].values[0][0]
-            for symbol in list(price_history.columns)
-        ]
+        current_prices = [self.markets_by_symbol[symbol]["current_price"] for symbol in price_history.columns]
         current_prices = pd.DataFrame(
             [current_prices],
             columns=price_history.columns,
             index=[pd.Timestamp.now(tz="utc")],
+            dtype=np.float32,
         )
-        price_history = pd.concat([price_history, current_prices]).sort_index()
-        if start_time + pd.Timedelta(days=2) < price_history.index.min():
-            zero_row = pd.DataFrame(0, index=[start_time], columns=price_history.columns)
-            price_history = pd.concat([price_history, zero_row]).sort_index()
+        price_history = pd.concat([price_history, current_prices])
+        if not price_history.index.is_monotonic_increasing:
+            price_history = price_history.sort_index()
+        if start_time + pd.Timedelta(days=2) < price_history.index[0]:
+            # the zero row is before all prices, no sorting needed
+            zero_row = pd.DataFrame(0.0, index=[start_time], columns=price_history.columns, dtype=np.float32)
+            price_history = pd.concat([zero_row, price_history])
         price_history.index = pd.to_datetime(price_history.index, utc=True).tz_convert(tz="Europe/Berlin")
 
-        invested = (
-            self.trades_df[["date", "buy_symbol", self.base_cost_row]]
-            .groupby(["date", "buy_symbol"], as_index=False, axis=0)
-            .sum(numeric_only=True)
-        )
-        value = (
-            self.trades_df[["date", "buy_symbol", "amount"]]
-            .groupby(["date", "buy_symbol"], as_index=False, axis=0)
-            .sum(numeric_only=True)
+        # cumulated amount and cost of every coin at each timestamp of price_history, looked up by timestamp
+        trade_times, coins, holdings = self.cumulated_holdings(trades_df)
+        n_coins = len(coins)
+        price_times = price_history.index.asi8
+        holdings = np.asfortranarray(holdings[np.searchsorted(trade_times, price_times, side="right")])
+
+        invested = pd.DataFrame(holdings[:, n_coins:], index=price_history.index, columns=coins)
+        priced = np.isin(coins, price_history.columns)
+        value = pd.DataFrame(
+            np.multiply(holdings[:, :n_coins][:, priced], price_history[coins[priced]].to_numpy(), order="F"),
+            index=price_history.index,
+            columns=coins[priced],
         )
-        invested = invested.pivot(index="date", columns="buy_symbol", values=self.base_cost_row)
-        invested = invested.cumsum().fillna(method="ffill").fillna(0)
-        invested = invested.reindex(price_history.index, method="ffill").fillna(0)
-        invested.columns = invested.columns.str.lower()
-
-        value = value.pivot(index="date", columns="buy_symbol", values="amount")
-        value = value.cumsum().fillna(method="ffill").fillna(0)
-        value = value.reindex(price_history.index, method="ffill").fillna(0)
-        value.columns = value.columns.str.lower()
-        value = value * price_history
 
+        # the input frames stay referenced with the cache, so their ids can not be reused while cached
+        # one entry per chart range, so the telegram and dashboard ranges do not evict each other.
+        # The least recently computed range is dropped, e.g. an old time bucket of a dashboard range
+        self.value_histories.pop(from_timestamp, None)
+        if len(self.value_histories) >= self.max_value_histories:
+            self.value_histories.pop(list(self.value_histories)[0], None)
+        self.value_histories[from_timestamp] = (cache_key, (value, invested), (trades_df, history_df))
         return value, invested
 
+    def cumulated_holdings(self, trades_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # trade times (sorted), coins and the cumulated amount (first half of columns) and cost (second half)
+        # of every coin after each trade, for all coins at once. Only depends on the trades, so it is computed
+        # once per trades_df rather than per chart render
+        cache_key = (id(trades_df), self.base_cost_row)
+        if self.holdings_cache is not None and self.holdings_cache[0] == cache_key:
+            return self.holdings_cache[1]
+
+        # only the four used columns are taken out of trades_df as arrays, sorted by date
+        trade_times = pd.DatetimeIndex(trades_df["date"]).asi8
+        order = np.argsort(trade_times, kind="stable")
+        trade_times = trade_times[order]
+        buy_symbols = trades_df["buy_symbol"].astype(str).str.lower().to_numpy()[order]
+        amounts = np.nan_to_num(trades_df["amount"].to_numpy(dtype=float)[order])
+        costs = np.nan_to_num(trades_df[self.base_cost_row].to_numpy(dtype=float)[order])
+        coins, coin_idx = np.unique(buy_symbols, return_inverse=True)
+        n_trades, n_coins = len(trade_times), len(coins)
+        # one row per trade holding only the bought coin, cumulated over time.
+        # column-major like pandas' own blocks, so the cumsum and DataFrames built from it walk contiguous columns
+        holdings = np.zeros((n_trades + 1, 2 * n_coins), order="F")  # first row: nothing bought yet
+        rows = np.arange(1, n_trades + 1)
+        holdings[rows, coin_idx] = amounts
+        holdings[rows, n_coins + coin_idx] = costs
+        holdings = holdings.cumsum(axis=0, out=holdings)
+
+        # trades_df stays referenced with the cache, so its id can not be reused while cached
+        self.holdings_cache = (cache_key, (trade_times, coins, holdings), trades_df)
+        return trade_times, coins, holdings
+
     def value_history_chart(self, as_image=False, from_timestamp=None, title=True):
         try:
             value, invested = self.compute_value_history(from_timestamp=from_timestamp)
         except ValueError:
             return {}
-        performance_df = pd.DataFrame(index=value.index, columns=["invested", "net_worth"])
-        performance_df["invested"] = invested.sum(axis=1)
-        performance_df["net_worth"] = value.sum(axis=1)
-
-        if performance_df["invested"].min() == performance_df["invested"].max():
-            y = ["net_worth"]
-            color = [px.colors.sequential.Viridis[0]]
-        else:
-            y = ["invested", "net_worth"]
-            color = ["gray", px.colors.sequential.Viridis[0]]
-
-        fig = px.line(
-            performance_df,
-            x=performance_df.index,
-            y=y,
-            line_shape="spline",
-            render_mode="svg",
-            color_discrete_sequence=color,
+        # compute_value_history returns the same frames as long as the time range, trades and prices are the same
+        chart = self.cached_chart(("value_history", title, as_image), value)
+        if chart is not None:
+            return chart
+        dates = value.index
+        invested_total = invested.sum(axis=1).to_numpy()
+        net_worth = value.sum(axis=1).to_numpy()
+
+        line_shape, render_mode = line_style(len(dates), as_image)
+        scatter = go.Scattergl if render_mode == "webgl" else go.Scatter
+        fig = go.Figure()
+        if invested_total.min() != invested_total.max():
+            fig.add_trace(
+                scatter(
+                    x=dates, y=invested_total, name="invested", mode="lines", line=dict(color="gray", shape="hv")
+                )
+            )
+        fig.add_trace(
+            scatter(
+                x=dates,
+                y=net_worth,
+                name="net_worth",
+                mode="lines",
+                line=dict(color=px.colors.sequential.Viridis[0], shape=line_shape),
+            )
         )
-
-        fig.update_traces(selector=dict(name="invested"), line_shape="hv")
         fig.update_layout(
             showlegend=False,
             title={"xanchor": "center", "x": 0.5},
@@ -866,29 +1154,39 @@ class PortfolioAnalytics:
         if title:
             fig.update_layout(title="Portfolio value")
         if as_image:
-            return fig.to_image(format="png", width=1200, height=600)
+            chart = render_png(fig, width=1200, height=600)
         else:
-            return fig
+            chart = fig
+        self.charts[("value_history", title, as_image)] = (value, chart)
+        return chart
 
     def performance_chart(self, as_image=False, from_timestamp=None, title=True):
         try:
             value, invested = self.compute_value_history(from_timestamp=from_timestamp)
         except ValueError:
             return {}
-        performance_df = pd.DataFrame(index=value.index, columns=["invested", "net_worth"])
-        performance_df["invested"] = invested.sum(axis=1)
-        performance_df["net_worth"] = value.sum(axis=1)
-        performance_df["invested"] += performance_df["net_worth"].iloc[0] - performance_df["invested"].iloc[0]
-        performance_df["performance"] = (performance_df["net_worth"] / performance_df["invested"] - 1) * 100
-        performance_df.fillna(0, inplace=True)
-
-        fig = px.line(
-            performance_df,
-            x=performance_df.index,
-            y="performance",
-            line_shape="spline",
-            render_mode="svg",
-            color_discrete_sequence=["green"],
+        # compute_value_history returns the same frames as long as the time range, trades and prices are the same
+        chart = self.cached_chart(("performance", title, as_image), value)
+        if chart is not None:
+            return chart
+        dates = value.index
+        invested_total = invested.sum(axis=1).to_numpy()
+        net_worth = value.sum(axis=1).to_numpy()
+        invested_total = invested_total + (net_worth[0] - invested_total[0])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            performance = (net_worth / invested_total - 1) * 100
+        performance[np.isnan(performance)] = 0
+
+        line_shape, render_mode = line_style(len(dates), as_image)
+        scatter = go.Scattergl if render_mode == "webgl" else go.Scatter
+        fig = go.Figure(
+            scatter(
+                x=dates,
+                y=performance,
+                name="performance",
+                mode="lines",
+                line=dict(color="green", shape=line_shape),
+            )
         )
         fig.update_layout(
             showlegend=False,
@@ -900,9 +1198,9 @@ class PortfolioAnalytics:
             margin=dict(l=10, r=10, t=10, b=10),
         )
         fig.add_scatter(
-            x=performance_df.index,
-            y=performance_df.performance.where(performance_df.performance < 0),
-            line={"color": "red", "shape": "spline"},
+            x=dates,
+            y=np.where(performance < 0, performance, np.nan),
+            line={"color": "red", "shape": line_shape},
         )
         fig.update_xaxes(showgrid=False, title_text="", zeroline=True, fixedrange=True)
         fig.update_yaxes(
@@ -918,37 +1216,41 @@ class PortfolioAnalytics:
         if title:
             fig.update_layout(title="Portfolio performance")
         if as_image:
-            return fig.to_image(format="png", width=1200, height=600)
+            chart = render_png(fig, width=1200, height=600)
         else:
-            return fig
+            chart = fig
+        self.charts[("performance", title, as_image)] = (value, chart)
+        return chart
 
     async def update_portfolio_metrics(self):
-        top_gainers = self.index_df.nlargest(3, "performance")
-        worst_gainers = self.index_df.nsmallest(3, "performance")
+        index_df = self.index_df
+        if index_df is self.metrics_index_df:
+            # metrics are still up to date
+            return
+        performance = index_df["performance"].to_numpy(dtype=float)
+        # one sort of the coins with a performance gives both the top and the worst coins
+        ranked = np.flatnonzero(~np.isnan(performance))
+        ranked = ranked[np.argsort(performance[ranked], kind="stable")]
+        top_gainers = ranked[::-1][:3]
+        worst_gainers = ranked[:3]
+        symbols = index_df["symbol"].to_numpy()
+        growth = index_df["value"].to_numpy(dtype=float) - index_df[self.base_cost_row].to_numpy(dtype=float)
         # TODO could make these properties with @property decorator
-        self.top_symbols = top_gainers["symbol"].values
-        self.top_performances = top_gainers["performance"].values
-        self.top_growth = top_gainers["value"].values - top_gainers[self.base_cost_row].values
-        self.worst_symbols = worst_gainers["symbol"].values
-        self.worst_performances = worst_gainers["performance"].values
-        self.worst_growth = worst_gainers["value"].values - worst_gainers[self.base_cost_row].values
+        self.top_symbols = symbols[top_gainers]
+        self.top_performances = performance[top_gainers]
+        self.top_growth = growth[top_gainers]
+        self.worst_symbols = symbols[worst_gainers]
+        self.worst_performances = performance[worst_gainers]
+        self.worst_growth = growth[worst_gainers]
+        self.metrics_index_df = index_df
 
     @staticmethod
     def get_timestamp(value: str):
-        now = datetime.now(pytz.timezone("Europe/Berlin"))
-        if value == "day":
-            timestamp = (now - timedelta(days=1)).timestamp()
-        elif value == "week":
-            timestamp = (now - timedelta(weeks=1)).timestamp()
-        elif value == "month":
-            timestamp = (now - timedelta(days=30)).timestamp()
-        elif value == "6month":
-            timestamp = (now - timedelta(days=182)).timestamp()
-        elif value == "year":
-            timestamp = (now - timedelta(days=365)).timestamp()
-        else:
-            timestamp = None
-        return timestamp
+        if value not in chart_ranges:
+            return None
+        # the range start moves in steps of 30 seconds, so repeated chart renders share one range (and its cache)
+        now = time() // 30 * 30
+        return now - chart_ranges[value].total_seconds()
 
         # Compute the weights by market cap, fetching data from coingecko
         # Square root weights yield a less top heavy distribution of coin allocation (lower bitcoin weighting)
@@ -959,28 +1261,19 @@ class PortfolioAnalytics:
         else:
             symbols = np.asarray(self.config.trading_bot_config.cherry_pick_symbols)
 
+        in_index = np.isin(symbols, self.config.trading_bot_config.cherry_pick_symbols)
         if self.config.trading_bot_config.portfolio_weighting == WeightingEnum.equal:
-            weights = np.array(
-                [
-                    1 / len(self.config.trading_bot_config.cherry_pick_symbols)
-                    if sym in self.config.trading_bot_config.cherry_pick_symbols
-                    else 0.0
-                    for sym in symbols
-                ]
-            )
+            weights = in_index / len(self.config.trading_bot_config.cherry_pick_symbols)
         elif self.config.trading_bot_config.portfolio_weighting == WeightingEnum.custom:
-            weights = np.zeros(len(symbols))
-            for k, symbol in enumerate(symbols):
-                if symbol in self.config.trading_bot_config.custom_weights:
-                    weights[k] = self.config.trading_bot_config.custom_weights[symbol]
+            custom_weights = self.config.trading_bot_config.custom_weights
+            weights = np.array([custom_weights.get(symbol, 0.0) for symbol in symbols], dtype=float)
         else:
-            weights = np.asarray(
+            weights = np.array(
                 [
-                    self.markets.loc[self.markets.symbol == sym, "market_cap"].item()
-                    if sym in self.config.trading_bot_config.cherry_pick_symbols
-                    else 0.0
-                    for sym in symbols
-                ]
+                    self.markets_by_symbol[sym]["market_cap"] if sym_in_index else 0.0
+                    for sym, sym_in_index in zip(symbols, in_index)
+                ],
+                dtype=float,
             )
             if self.config.trading_bot_config.portfolio_weighting == WeightingEnum.sqrt_market_cap:
                 weights = np.sqrt(weights)
@@ -1010,19 +1303,14 @@ class PortfolioAnalytics:
         export["shares"] = self.trades_df["amount"]
         export["tax"] = 0
 
-        def get_fee(row: pd.Series):
-            if row["fee"] == 0 or math.isnan(row["fee"]):
-                return 0
-            if (
-                row["fee_symbol"] == "EUR"
-                or len(str(row["fee_symbol"])) == 0
-                or isinstance(row["fee_symbol"], float)
-            ):
-                # assuming that the fee is in euros if no other fee symbol is given!
-                return row["fee"]
-            return self.convert(row["fee"], row["fee_symbol"], "EUR")
-
-        export["fee"] = self.trades_df[["fee", "fee_symbol"]].apply(get_fee, axis=1)
+        fee = self.trades_df["fee"].fillna(0).to_numpy(dtype=float)
+        fee_symbol = self.trades_df["fee_symbol"].fillna("").astype(str)
+        # assuming that the fee is in euros if no other fee symbol is given!
+        to_convert = (fee != 0) & ~fee_symbol.isin(["EUR", ""]).to_numpy()
+        # convert once per fee symbol with the price of one unit
+        rates = {symbol: self.convert(1.0, symbol, "EUR") for symbol in fee_symbol[to_convert].unique()}
+        fee[to_convert] *= fee_symbol[to_convert].map(rates).to_numpy(dtype=float)
+        export["fee"] = fee
         export["type"] = "Buy"
         export["assettype"] = "Crypto"
         export["identifier"] = self.trades_df["buy_symbol"]
@@ -1,13 +1,19 @@
 from pathlib import Path
 import sys
 import yaml
-from typing import List, Union, Dict, Optional
+from typing import List, Union, Dict, Optional, Tuple
 from pydantic import BaseModel
 from pydantic.types import confloat, conint, constr
 from pydantic import validator, root_validator
 from aenum import MultiValueEnum
 import logging
 
+try:
+    # libyaml based loader is a lot faster, fall back to the pure python one if pyyaml was built without it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 if sys.version_info >= (3, 8):
     from typing import TypedDict
 else:
@@ -16,6 +22,28 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# parsed yaml files, keyed by resolved path: (st_mtime_ns, st_size, data)
+_yaml_cache: Dict[Path, Tuple[int, int, dict]] = {}
+
+
+# config.yaml is read by several config classes, so only parse it again if the file changed on disk
+# the returned dict is shared between callers and must not be mutated
+def load_yaml_file(file_path) -> dict:
+    file = Path(file_path).resolve()
+    stat = file.stat()
+    cached = _yaml_cache.get(file)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(file) as f:
+        try:
+            data = yaml.load(f, Loader=SafeLoader)
+        except yaml.YAMLError as exc:
+            logger.error(f"Error while parsing {file.name}:")
+            logger.error(exc)
+            raise exc
+    _yaml_cache[file] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
 
 # Convention for multi value enums:
 #   - value: used in config and code (string as defined by ccxt)
@@ -113,14 +141,7 @@ class DashboardConfig(BaseConfig):
 
     @classmethod
     def from_config_yaml(cls, file_path):
-        file = Path(file_path)
-        with open(file) as f:
-            try:
-                data = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                logger.error("Error while parsing config file:")
-                logger.error(exc)
-                raise exc
+        data = load_yaml_file(file_path)
         config = data["dashboard"]
         self = cls.from_dict(config)
         return self
@@ -183,14 +204,7 @@ class TradingBotConfig(BaseConfig):
 
     @classmethod
     def from_config_yaml(cls, file_path):
-        file = Path(file_path)
-        with open(file) as f:
-            try:
-                data = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                logger.error("Error while parsing config file:")
-                logger.error(exc)
-                raise exc
+        data = load_yaml_file(file_path)
         config = data["trading_bot"]
         self = cls.from_dict(config)
         return self
@@ -226,16 +240,9 @@ class TelegramBotConfig(BaseConfig):
 
     @classmethod
     def from_config_yaml(cls, file_path):
-        file = Path(file_path)
-        with open(file) as f:
-            try:
-                data = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                logger.error("Error while parsing config file:")
-                logger.error(exc)
-                raise exc
-            config = data["telegram_bot"]
-            self = cls.from_dict(config)
+        data = load_yaml_file(file_path)
+        config = data["telegram_bot"]
+        self = cls.from_dict(config)
         return self
 
     @classmethod
@@ -256,14 +263,7 @@ class SecretsStore(BaseConfig):
 
     @classmethod
     def from_secrets_yaml(cls, file_path):
-        file = Path(file_path)
-        with open(file) as f:
-            try:
-                data = yaml.safe_load(f)
-            except yaml.YAMLError as exc:
-                logger.error("Error while parsing secrets file:")
-                logger.error(exc)
-                raise exc
+        data = load_yaml_file(file_path)
         self = cls.from_dict(data)
         return self
 
@@ -21,6 +21,14 @@ COIN_SYNONYMS: Final = [
     ["ADA", "ADA.S"],
 ]
 
+# key: symbol
+# value: all other symbols of the first synonym group containing it
+COIN_ALTERNATIVES: Final = {
+    symbol: tuple(syn for syn in synonyms if syn != symbol)
+    for synonyms in reversed(COIN_SYNONYMS)
+    for symbol in synonyms
+}
+
 
 class Auth0EnvNames:
     """Constants for Auth0"""
@@ -1,4 +1,6 @@
 import ccxt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from config import ExchangeEnum, Config
 import logging
 
@@ -13,9 +15,18 @@ class Exchanges:
         self.secrets = config.secrets
         self.trading_config = config.trading_bot_config
 
-        for exchange_token in self.secrets.get_exchange_tokens(test_mode=self.trading_config.test_mode):
-            if not self.init_exchange(exchange_name=exchange_token["exchange"]):
-                logger.warning(f"No valid API tokens for exchange {exchange_token['exchange'].values[1]}")
+        exchange_names = [
+            exchange_token["exchange"]
+            for exchange_token in self.secrets.get_exchange_tokens(test_mode=self.trading_config.test_mode)
+        ]
+        # connecting mostly waits for the network (loading markets), so do it for all exchanges concurrently
+        with ThreadPoolExecutor(max_workers=len(exchange_names)) as executor:
+            exchanges = list(executor.map(self.connect_exchange, exchange_names))
+        for exchange_name, exchange in zip(exchange_names, exchanges):
+            if exchange is None:
+                logger.warning(f"No valid API tokens for exchange {exchange_name.values[1]}")
+            else:
+                self.authorized_exchanges[exchange_name] = exchange
 
         if self.trading_config.exchange not in self.authorized_exchanges.keys():
             raise RuntimeWarning(
@@ -27,10 +38,11 @@ class Exchanges:
         logger.info("List of exchanges with validated API tokens:")
         logger.info([exchange.values[1] for exchange in self.authorized_exchanges.keys()])
 
-    def init_exchange(
+    # returns the authenticated exchange with loaded markets, or None if it can not be used
+    def connect_exchange(
         self,
         exchange_name: ExchangeEnum,
-    ) -> bool:
+    ) -> Optional[ccxt.Exchange]:
         if exchange_name == ExchangeEnum.binance:
             exchange = ccxt.binance()
             if self.trading_config.test_mode:
@@ -50,7 +62,7 @@ class Exchanges:
         elif exchange_name == ExchangeEnum.coinbasepro:
             exchange = ccxt.coinbasepro()
             if self.trading_config.test_mode:
-                return False  # Coinbase Pro does not have a test mode
+                return None  # Coinbase Pro does not have a test mode
             else:
                 exchange.apiKey = self.secrets.coinbasepro["api_key"]
                 exchange.secret = self.secrets.coinbasepro["secret"]
@@ -59,7 +71,7 @@ class Exchanges:
             exchange = ccxt.coinbase()
             exchange.options["createMarketBuyOrderRequiresPrice"] = False
             if self.trading_config.test_mode:
-                return False
+                return None
             else:
                 exchange.apiKey = self.secrets.coinbase["api_key"]
                 exchange.secret = self.secrets.coinbase["secret"]
@@ -70,19 +82,11 @@ class Exchanges:
             exchange.set_sandbox_mode(self.trading_config.test_mode)
         elif self.trading_config.test_mode:
             # Test mode is enabled, but current exchange does not support it
-            return False
+            return None
         if not exchange.check_required_credentials():
-            return False
+            return None
         try:
             exchange.load_markets()
         except ccxt.AuthenticationError:
-            return False
-        self.authorized_exchanges[exchange_name] = exchange
-        return True
-
-        # not_available = [symbol.upper() for symbol in self.trading_config.cherry_pick_symbols if
-        #                  f'{symbol.upper()}/{self.trading_config.base_symbol.upper()}' not in
-        #                  self.exchange.symbols and symbol != self.trading_config.base_symbol]
-        # if len(not_available) > 0:
-        #     logger.warning(f'Some of your cherry picked coins are not available on {self.exchange.name}:')
-        #     logger.warning(not_available)
+            return None
+        return exchange
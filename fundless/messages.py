@@ -1,3 +1,4 @@
+import asyncio
 import time
 import requests.exceptions
 from utils import print_crypto_amount
@@ -148,7 +149,8 @@ class TelegramBot:
         balance = (await self.trading_bot.analytics.index_balance())[2].sum()
         performance = self.trading_bot.analytics.performance
 
-        chart = self.trading_bot.analytics.value_history_chart(as_image=True)
+        # render the chart in a worker thread, so the bot keeps answering other commands meanwhile
+        chart = await asyncio.to_thread(self.trading_bot.analytics.value_history_chart, as_image=True)
 
         if balance - invested > 0:
             pl = "Profit"
@@ -168,7 +170,7 @@ class TelegramBot:
 
     @authorized_only
     async def _allocation(self, _: Update, context: CallbackContext):
-        allocation_pie_chart = self.trading_bot.analytics.allocation_pie(as_image=True)
+        allocation_pie_chart = await asyncio.to_thread(self.trading_bot.analytics.allocation_pie, as_image=True)
         await context.bot.send_photo(chat_id=self.chat_id, photo=allocation_pie_chart)
 
     @authorized_only
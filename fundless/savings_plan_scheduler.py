@@ -5,12 +5,15 @@ from messages import TelegramBot
 from typing import List
 import logging
 import schedule
-import time
-from threading import Lock
+from threading import Lock, Event
 
 
 logger = logging.getLogger(__name__)
 
+# upper bound for sleeping between jobs, so that wall clock adjustments (e.g. NTP sync on devices without rtc)
+# can not delay a savings plan execution for too long
+MAX_IDLE_SECONDS = 15 * 60
+
 
 class SavingsPlanScheduler:
     def __init__(self, config: Config, message_bot: TelegramBot):
@@ -19,17 +22,19 @@ class SavingsPlanScheduler:
         self.execution_time = config.trading_bot_config.savings_plan_execution_time
         self.message_bot = message_bot
         self.lock = Lock()
+        self.stop_event = Event()
 
     def job(self):
         if not self.lock.acquire(blocking=False):
             logger.warning("Savings plan execution was invoked, while another order is already running!")
             return
         try:
+            today = date.today()
             if isinstance(self.interval, List):
-                if date.today().day not in self.interval:
-                    logger.info(f"No savings plan execution today ({date.today().strftime('%d.%m.%y')})")
+                if today.day not in self.interval:
+                    logger.info(f"No savings plan execution today ({today.strftime('%d.%m.%y')})")
                     return
-            logger.info(f"Executing savings plan now ({date.today().strftime('%d.%m.%y')})...")
+            logger.info(f"Executing savings plan now ({today.strftime('%d.%m.%y')})...")
             if self.config.trading_bot_config.savings_plan_automatic_execution:
                 with asyncio.Runner() as runner:
                     runner.run(self.message_bot.send("Executing savings plan!"))
@@ -53,6 +58,14 @@ class SavingsPlanScheduler:
             schedule.every().day.at(self.execution_time).do(self.job)
         else:
             raise ValueError(f"Unknown interval for savings plan execution: {self.interval}")
-        while True:
+        # sleep until the next job is due instead of polling
+        while not self.stop_event.is_set():
+            idle_seconds = schedule.idle_seconds()
+            if idle_seconds is None:
+                break
+            if idle_seconds > 0 and self.stop_event.wait(min(idle_seconds, MAX_IDLE_SECONDS)):
+                break
             schedule.run_pending()
-            time.sleep(40)
+
+    def stop(self):
+        self.stop_event.set()
@@ -38,7 +38,7 @@ class TradingBot:
             symbol.upper()
             for symbol in self.bot_config.trading_bot_config.cherry_pick_symbols
             if f"{symbol.upper()}/{self.bot_config.trading_bot_config.base_symbol.upper()}"
-            not in self.exchanges.active.symbols
+            not in self.exchanges.active.markets
             and symbol != self.bot_config.trading_bot_config.base_symbol
         ]
         if len(not_available) > 0:
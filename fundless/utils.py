@@ -2,9 +2,6 @@ from pathlib import Path
 import yaml
 import math
 import ast
-from dash import dcc
-from dash import html
-import dash_bootstrap_components as dbc
 from xml.etree import ElementTree
 import logging
 
@@ -53,10 +50,15 @@ def parse_secrets(file_path):
 
 
 def convert_html_to_dash(html_code):
-    dash_modules = [dcc, html, dbc]
     """Convert standard html (as string) to Dash components.
 
     Looks into the list of dash_modules to find the right component (default to [html, dcc, dbc])."""
+    # dash is imported here, so that importing utils does not pull in dash when the dashboard is disabled
+    from dash import dcc
+    from dash import html
+    import dash_bootstrap_components as dbc
+
+    dash_modules = [dcc, html, dbc]
 
     def find_component(name):
         for module in dash_modules: